@@ -0,0 +1,129 @@
+import json
+import os
+from enum import Enum
+from logging import debug, info, warning
+from threading import Lock
+from time import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from http_pool import http_session
+from utils import write_atomically
+
+# Probed hosts are checked again after this time, in case an instance changed its software
+CACHE_TTL = 30 * 24 * 60 * 60
+
+
+class ForgeType(Enum):
+    GITHUB = "github"
+    GITLAB = "gitlab"
+    # Anything we have no API backend for (Bitbucket, SourceForge, Gitea, plain websites, ...)
+    OTHER = "other"
+
+
+KNOWN_HOSTS = {
+    "github.com": ForgeType.GITHUB,
+    "gitlab.com": ForgeType.GITLAB,
+    "bitbucket.org": ForgeType.OTHER,
+    "sourceforge.net": ForgeType.OTHER,
+    "codeberg.org": ForgeType.OTHER,
+}
+KNOWN_HOST_SUFFIXES = {
+    ".github.io": ForgeType.OTHER,
+    ".gitlab.io": ForgeType.OTHER,
+    ".sourceforge.net": ForgeType.OTHER,
+}
+
+
+def probe_forge_type(base_url: str) -> Optional[ForgeType]:
+    """Returns None if the host had a server error, so the result is inconclusive"""
+    # Unauthenticated requests to the Gitlab API are either answered with the public
+    # projects or with a JSON error. Both carry Gitlab specific headers in any case.
+    resp = http_session.get(f"{base_url}/api/v4/projects?per_page=1", timeout=10)
+    if any(header.lower().startswith("x-gitlab") for header in resp.headers):
+        return ForgeType.GITLAB
+    if resp.status_code >= 500:
+        warning(
+            f"Could not determine the forge type of {base_url}: status {resp.status_code}"
+        )
+        return None
+    if resp.status_code in [200, 401, 403] and resp.headers.get(
+        "Content-Type", ""
+    ).startswith("application/json"):
+        try:
+            content = resp.json()
+        except ValueError:
+            return ForgeType.OTHER
+        if isinstance(content, list) or (
+            isinstance(content, dict) and "message" in content
+        ):
+            return ForgeType.GITLAB
+    return ForgeType.OTHER
+
+
+class ForgeCache:
+    """Remembers which software runs on a host, so that each host is only probed once"""
+
+    filename: Optional[str]
+    entries: Dict[str, Dict[str, Any]]
+
+    def __init__(self):
+        self.filename = None
+        self.entries = {}
+        self.lock = Lock()
+
+    def load(self, filename: str):
+        self.filename = filename
+        if os.path.exists(filename):
+            with open(filename, "r") as cachefile:
+                self.entries = json.load(cachefile)
+            info(f"Loaded forge types of {len(self.entries)} hosts from {filename}")
+
+    def save(self):
+        if self.filename is None:
+            return
+
+        def write_cache(cachefile):
+            json.dump(self.entries, cachefile, indent=1, sort_keys=True)
+
+        write_atomically(self.filename, write_cache)
+
+    def forge_type(self, url: str) -> ForgeType:
+        parsed_url = urlparse(url)
+        host = parsed_url.netloc
+
+        if parsed_url.scheme not in ["http", "https"]:
+            # e.g. local repositories or ssh, only reachable with git itself
+            return ForgeType.OTHER
+        if host in KNOWN_HOSTS:
+            return KNOWN_HOSTS[host]
+        for suffix, forge in KNOWN_HOST_SUFFIXES.items():
+            if host.endswith(suffix):
+                return forge
+
+        with self.lock:
+            entry = self.entries.get(host)
+        if entry is not None and time() - entry["checked"] < CACHE_TTL:
+            return ForgeType(entry["forge"])
+
+        # Not locked, so that a slow host doesn't block the lookups of all other hosts.
+        # Concurrent lookups of the same host might probe it twice, which is harmless.
+        try:
+            forge = probe_forge_type(f"{parsed_url.scheme}://{host}")
+        except requests.RequestException as exc:
+            # Not cached, the host might be reachable in the next run
+            warning(f"Could not determine the forge type of {host}: {exc}")
+            return ForgeType.OTHER
+
+        if forge is None:
+            return ForgeType.OTHER
+        debug(f"{host} has forge type {forge.value}")
+        with self.lock:
+            self.entries[host] = {"forge": forge.value, "checked": time()}
+            self.save()
+        return forge
+
+
+forge_cache = ForgeCache()
@@ -0,0 +1,274 @@
+import json
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from datetime import date
+from logging import debug, info
+from threading import Lock
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from dateutil.parser import parse
+
+from retry_policy import circuit_breaker
+from utils import (Activity, License, is_release_tag, sort_tags_alphanumeric,
+                   write_atomically)
+
+GIT_TIMEOUT = 30
+# Parts of git's error messages which mean that the host itself is unreachable, as
+# opposed to e.g. a missing repository on a working host
+CONNECTION_ERRORS = [
+    "could not resolve host",
+    "failed to connect",
+    "couldn't connect",
+    "connection refused",
+    "connection timed out",
+    "connection reset",
+    "ssh: connect to host",
+]
+
+
+class GitConnectionError(requests.ConnectionError):
+    """The git server could not be reached, as opposed to a failing git command"""
+
+
+def run_git(*args: str, cwd: Optional[str] = None) -> str:
+    # Never ask for credentials, private or missing repositories should just fail
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=GIT_TIMEOUT,
+            check=True,
+        )
+    except subprocess.TimeoutExpired:
+        raise GitConnectionError(f"git {args[0]} has timed out")
+    except subprocess.CalledProcessError as exc:
+        message = f"git {args[0]} failed: {exc.stderr.strip()}"
+        if any(e in message.lower() for e in CONNECTION_ERRORS):
+            raise GitConnectionError(message)
+        raise ValueError(message)
+    except OSError as exc:
+        # most likely git is not installed
+        raise ValueError(f"Cannot run git: {exc}")
+    return result.stdout
+
+
+@dataclass
+class RemoteRef:
+    # short name as shown to the user, e.g. "v1.2.0"
+    name: str
+    # full ref name on the remote, e.g. "refs/tags/v1.2.0"
+    ref: str
+    # sha of the commit the ref points to (tags are peeled)
+    sha: str
+
+
+def list_remote_refs(url: str) -> Dict[str, str]:
+    """Returns the commit of HEAD and all tags from the ref advertisement, without cloning anything.
+
+    Raises ValueError if the repository can't be listed and a requests.ConnectionError
+    if the host is unreachable.
+    """
+    host = urlparse(url).hostname
+    if host is not None:
+        circuit_breaker.check(host)
+
+    try:
+        output = run_git("ls-remote", url, "HEAD", "refs/tags/*")
+    except GitConnectionError:
+        if host is not None:
+            circuit_breaker.record_failure(host)
+        raise
+    if host is not None:
+        circuit_breaker.record_success(host)
+
+    refs = {}
+    for line in output.splitlines():
+        sha, ref = line.split("\t", 1)
+        if ref.endswith("^{}"):
+            # the commit an annotated tag points to
+            refs[ref[: -len("^{}")]] = sha
+        elif ref not in refs:
+            refs[ref] = sha
+    return refs
+
+
+class CommitDateCache:
+    """Commit dates by sha. Commits never change, so the entries never expire."""
+
+    filename: Optional[str]
+    dates: Dict[str, str]
+
+    def __init__(self):
+        self.filename = None
+        self.dates = {}
+        self.lock = Lock()
+
+    def load(self, filename: str):
+        self.filename = filename
+        if os.path.exists(filename):
+            with open(filename, "r") as cachefile:
+                self.dates = json.load(cachefile)
+            info(f"Loaded {len(self.dates)} commit dates from {filename}")
+
+    def save(self):
+        if self.filename is None:
+            return
+
+        def write_cache(cachefile):
+            json.dump(self.dates, cachefile, indent=1, sort_keys=True)
+
+        write_atomically(self.filename, write_cache)
+
+    def get(self, sha: str) -> Optional[date]:
+        with self.lock:
+            if sha not in self.dates:
+                return None
+            return parse(self.dates[sha]).date()
+
+    def resolve(self, url: str, refs: List[RemoteRef]):
+        """Fetches the commit dates of the refs that are not known from a previous run"""
+        with self.lock:
+            missing = [r for r in refs if r.sha not in self.dates]
+        if len(missing) == 0:
+            return
+
+        debug(f"Fetching {len(missing)} commits from {url}")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            run_git("init", "--quiet", "--bare", tmpdir)
+            # Only the commits themselves are needed: no history and (if the server supports it) no trees
+            run_git(
+                "fetch",
+                "--quiet",
+                "--depth=1",
+                "--no-tags",
+                "--filter=tree:0",
+                url,
+                *sorted(set(r.ref for r in missing)),
+                cwd=tmpdir,
+            )
+            output = run_git(
+                "log",
+                "--no-walk",
+                "--format=%H %cI",
+                *sorted(set(r.sha for r in missing)),
+                cwd=tmpdir,
+            )
+
+        with self.lock:
+            for line in output.splitlines():
+                sha, commit_date = line.split(" ", 1)
+                self.dates[sha] = commit_date
+            self.save()
+
+
+commit_date_cache = CommitDateCache()
+
+
+class GitRemoteRepo:
+    """Releases and last activity of any git repository, gathered with the git protocol instead of an API"""
+
+    url: str
+    head: Optional[RemoteRef]
+    release_tags: List[RemoteRef]
+
+    def __init__(
+        self, url: str, tag_url: Optional[str] = None, commit_url: Optional[str] = None
+    ):
+        # `tag_url` and `commit_url` are format strings for the web pages of a tag and a
+        # commit, e.g. "{url}/-/tags/{tag}" and "{url}/-/commit/{sha}"
+        self.url = url.rstrip("/")
+        self.tag_url = tag_url
+        self.commit_url = commit_url
+
+        refs = list_remote_refs(self.url)
+        self.head = None
+        if "HEAD" in refs:
+            self.head = RemoteRef("HEAD", "HEAD", refs["HEAD"])
+        tags = [
+            RemoteRef(ref[len("refs/tags/") :], ref, sha)
+            for ref, sha in refs.items()
+            if ref.startswith("refs/tags/")
+        ]
+        self.release_tags = sort_tags_alphanumeric(filter(is_release_tag, tags))
+
+        # Like the API backends, only the first and the latest release are dated
+        wanted = self.release_tags[0:1] + self.release_tags[-1:]
+        if self.head is not None:
+            wanted.append(self.head)
+        commit_date_cache.resolve(self.url, wanted)
+
+    def tag_activity(self, tag: RemoteRef) -> Optional[Activity]:
+        commit_date = commit_date_cache.get(tag.sha)
+        if commit_date is None:
+            return None
+        url = None
+        if self.tag_url is not None:
+            url = self.tag_url.format(url=self.url, tag=tag.name)
+        return Activity(commit_date, url)
+
+    def get_latest_release(self) -> Optional[Activity]:
+        try:
+            return self.tag_activity(self.release_tags[-1])
+        except IndexError:
+            return None
+
+    def get_first_release(self) -> Optional[Activity]:
+        try:
+            return self.tag_activity(self.release_tags[0])
+        except IndexError:
+            return None
+
+    def get_license(self) -> Optional[License]:
+        # Would require the content of the repository
+        return None
+
+    def get_last_activity(self) -> Optional[Activity]:
+        if self.head is None:
+            return None
+        commit_date = commit_date_cache.get(self.head.sha)
+        if commit_date is None:
+            return None
+        url = None
+        if self.commit_url is not None:
+            url = self.commit_url.format(url=self.url, sha=self.head.sha)
+        return Activity(commit_date, url)
+
+    def get_languages(self) -> List[str]:
+        return []
+
+    def get_tags(self) -> List[str]:
+        return []
+
+
+class GitReleaseRepo:
+    """Takes releases and last activity from the git refs and everything else from the forge API"""
+
+    def __init__(self, api_repo: Any, git_repo: GitRemoteRepo):
+        self.api_repo = api_repo
+        self.git_repo = git_repo
+
+    def get_latest_release(self) -> Optional[Activity]:
+        return self.git_repo.get_latest_release()
+
+    def get_first_release(self) -> Optional[Activity]:
+        return self.git_repo.get_first_release()
+
+    def get_license(self) -> Optional[License]:
+        return self.api_repo.get_license()
+
+    def get_last_activity(self) -> Optional[Activity]:
+        return self.git_repo.get_last_activity()
+
+    def get_languages(self) -> List[str]:
+        return self.api_repo.get_languages()
+
+    def get_tags(self) -> List[str]:
+        return self.api_repo.get_tags()
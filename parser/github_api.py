@@ -8,16 +8,56 @@ from github import Github
 from github.GithubException import UnknownObjectException
 from github.GitRelease import GitRelease
 from github.Repository import Repository
+from github.Requester import HTTPSRequestsConnectionClass, Requester
 from github.Tag import Tag
 
+from http_pool import http_session
 from utils import Activity, License, is_release_tag, sort_tags_alphanumeric
 
+
+class PooledHTTPSConnection(HTTPSRequestsConnectionClass):
+    # PyGithub opens its own requests session per connection. This replaces it with
+    # the shared session, so the connections to the Github API are pooled as well.
+    protocol = "https"
+    default_port = 443
+
+    def __init__(
+        self,
+        host: str,
+        port: Optional[int] = None,
+        strict: bool = False,
+        timeout: Optional[int] = None,
+        retry=None,
+        pool_size: Optional[int] = None,
+        **kwargs,
+    ):
+        self.host = host
+        self.port = port if port else self.default_port
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.session = http_session
+
+    def close(self):
+        # The shared session must stay open
+        pass
+
+
+class PooledHTTPConnection(PooledHTTPSConnection):
+    protocol = "http"
+    default_port = 80
+
+
+Requester.injectConnectionClasses(PooledHTTPConnection, PooledHTTPSConnection)
+
 api_key = environ.get("GITHUB_API_KEY")
 github_api = Github() if api_key is None else Github(api_key)
-print(f"GitHub rate limit: remaining {github_api.get_rate_limit().core.remaining}")
-print(
-    f"Resets in {round((github_api.get_rate_limit().core.reset.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).seconds / 60, 1)} Minutes"
-)
+
+
+def print_rate_limit():
+    print(f"GitHub rate limit: remaining {github_api.get_rate_limit().core.remaining}")
+    print(
+        f"Resets in {round((github_api.get_rate_limit().core.reset.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).seconds / 60, 1)} Minutes"
+    )
 
 
 class GithubRepo:
@@ -45,11 +85,20 @@ class GithubRepo:
             )
         self.url = url
         self.repo = repo
+        self.taglist = None
+        self.releases = None
+        self.releases_loaded = False
+
+    def load_releases(self):
+        # Tags and releases cost several API calls, so they are only fetched when needed
+        if self.releases_loaded:
+            return
         self.create_sorted_taglist()
         try:
             self.releases = self.repo.get_releases()
         except IndexError:
             self.releases = None
+        self.releases_loaded = True
 
     def create_sorted_taglist(self):
         # This is a workaround, as the last_modified property in the taglist is buggy. See https://github.com/PyGithub/PyGithub/issues/1642
@@ -64,6 +113,7 @@ class GithubRepo:
         self.taglist = sorted(date_by_commit_list, key=lambda dt: dt[0])
 
     def get_latest_release(self) -> Optional[Activity]:
+        self.load_releases()
         latest_tag = None
         latest_tag_activity = None
         try:
@@ -96,6 +146,7 @@ class GithubRepo:
             return None
 
     def get_first_release(self) -> Optional[Activity]:
+        self.load_releases()
         first_tag = None
         first_tag_activity = None
         try:
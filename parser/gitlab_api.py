@@ -1,6 +1,6 @@
 from datetime import datetime
-
-from typing import List, Optional, Tuple
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 from dateutil.parser import parse
@@ -8,8 +8,22 @@ from gitlab import Gitlab
 from gitlab.exceptions import GitlabGetError, GitlabHttpError
 from gitlab.v4.objects.projects import Project
 
+from http_pool import http_session
 from utils import Activity, License, is_release_tag, sort_tags_alphanumeric
 
+# One client per Gitlab instance, all of them share the pooled connections
+_gitlab_instances: Dict[str, Gitlab] = {}
+_gitlab_instances_lock = Lock()
+
+
+def get_gitlab_instance(base_url: str) -> Gitlab:
+    with _gitlab_instances_lock:
+        if base_url not in _gitlab_instances:
+            _gitlab_instances[base_url] = Gitlab(
+                base_url, session=http_session, timeout=10
+            )
+        return _gitlab_instances[base_url]
+
 
 class GitlabRepo:
     url: str
@@ -20,8 +34,14 @@ class GitlabRepo:
 
         repo_path = parsed_url.path.rstrip("/").lstrip("/")
 
-        gl = Gitlab(parsed_url.scheme + "://" + parsed_url.netloc)
-        repo = gl.projects.get(repo_path)
+        gl = get_gitlab_instance(parsed_url.scheme + "://" + parsed_url.netloc)
+        try:
+            repo = gl.projects.get(repo_path)
+        except GitlabGetError as exc:
+            if exc.response_code not in [401, 403, 404]:
+                raise
+            # invalid url or private project
+            raise ValueError(f"Cannot open gitlab repo {url}")
 
         self.url = url
         self.repo = repo
@@ -0,0 +1,181 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from logging import debug, info, warning
+from threading import Lock
+from time import sleep
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+from retry_policy import circuit_breaker, retry_policy
+
+# Maximum number of kept-alive connections per host. This should not be lower than the
+# number of threads used for the URL validation, otherwise connections get discarded
+DEFAULT_POOL_SIZE = 32
+# Number of hosts for which a connection pool is kept
+NUM_POOLS = 100
+
+
+@dataclass
+class PoolStatistics:
+    lookups: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.lookups - self.misses
+
+
+_pool_sizes: Dict[str, int] = {}
+_statistics: Dict[str, PoolStatistics] = defaultdict(PoolStatistics)
+_statistics_lock = Lock()
+
+
+def set_pool_size(size: int, host: Optional[str] = None):
+    """Sets the pool size for `host`, or the default pool size if no host is given.
+
+    This only affects connection pools created afterwards.
+    """
+    global DEFAULT_POOL_SIZE
+    if host is None:
+        DEFAULT_POOL_SIZE = size
+    else:
+        _pool_sizes[host] = size
+
+
+def pool_statistics() -> Dict[str, PoolStatistics]:
+    with _statistics_lock:
+        return {
+            host: PoolStatistics(stats.lookups, stats.misses)
+            for host, stats in _statistics.items()
+        }
+
+
+class _CountingPoolMixin:
+    # Every request takes a connection from the pool. If it has no open socket (because
+    # it is new or the server closed it in the meantime), it has to connect again
+    # including the TLS handshake, which counts as a miss.
+
+    def _get_conn(self, timeout=None):
+        with _statistics_lock:
+            _statistics[self.host].lookups += 1
+        return super()._get_conn(timeout)
+
+    def _make_request(self, conn, *args, **kwargs):
+        if getattr(conn, "sock", None) is None:
+            with _statistics_lock:
+                _statistics[self.host].misses += 1
+        return super()._make_request(conn, *args, **kwargs)
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _PerHostPoolManager(PoolManager):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        if request_context is None:
+            request_context = self.connection_pool_kw.copy()
+        request_context["maxsize"] = _pool_sizes.get(host, DEFAULT_POOL_SIZE)
+        return super()._new_pool(scheme, host, port, request_context)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    def __init__(self, **kwargs):
+        super().__init__(pool_connections=NUM_POOLS, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _PerHostPoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs
+        )
+
+
+class ResilientSession(requests.Session):
+    # Only requests without side effects are repeated
+    IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS"]
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlparse(url).hostname
+        retry = method.upper() in self.IDEMPOTENT_METHODS
+        attempt = 0
+        # time spent waiting for retries, limited by the retry policy
+        waited = 0.0
+        while True:
+            circuit_breaker.check(host)
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except requests.Timeout:
+                # A timeout already took long enough, so it is not retried
+                circuit_breaker.record_failure(host)
+                raise
+            except requests.ConnectionError as exc:
+                host_down = circuit_breaker.record_failure(host)
+                if not retry or host_down or attempt + 1 >= retry_policy.max_attempts:
+                    raise
+                delay = retry_policy.backoff(attempt)
+                if delay > retry_policy.total_delay_left(host, waited):
+                    raise
+                warning(f"Request to {url} failed ({exc}), retrying in {round(delay, 1)}s")
+                sleep(delay)
+                waited += delay
+                attempt += 1
+                continue
+
+            circuit_breaker.record_success(host)
+            delay = retry_policy.retry_delay(attempt, response, waited) if retry else None
+            if delay is None:
+                return response
+            info(
+                f"Got response {response.status_code} for {url}, retrying in {round(delay, 1)}s"
+            )
+            response.close()
+            sleep(delay)
+            waited += delay
+            attempt += 1
+
+
+def _no_auth(request: requests.PreparedRequest) -> requests.PreparedRequest:
+    return request
+
+
+def _create_session() -> requests.Session:
+    session = ResilientSession()
+    session.mount("http://", PooledHTTPAdapter())
+    session.mount("https://", PooledHTTPAdapter())
+    # Otherwise requests falls back to the credentials in ~/.netrc, which would
+    # override the authentication headers of the API clients
+    session.auth = _no_auth
+    return session
+
+
+# Shared by the URL validation and the Github and Gitlab clients, so that connections
+# (and TLS handshakes) to the same host are reused across all of them and they all
+# follow the same retry policy and circuit breakers
+http_session = _create_session()
+
+
+def log_pool_statistics():
+    stats = pool_statistics()
+    hits = sum(s.hits for s in stats.values())
+    misses = sum(s.misses for s in stats.values())
+    info(f"HTTP connection pool: {hits} hits, {misses} misses on {len(stats)} hosts")
+    for host, s in sorted(stats.items(), key=lambda itm: itm[1].lookups, reverse=True):
+        debug(f"- {host}: {s.hits} hits, {s.misses} misses")
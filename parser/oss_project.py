@@ -1,21 +1,26 @@
+import json
 import re
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
 from datetime import date
 from enum import Enum
 from sys import stderr
-from time import sleep
 from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
-from urllib.parse import urlparse
 
 import requests
 import validators
 from dateutil.parser import parse
 from logging import info, warning, error, debug
 
-from github_api import GithubRepo, github_api
+from github.GithubException import GithubException
+from gitlab.exceptions import GitlabError
+
+from forge_detection import ForgeType, forge_cache
+from git_remote import GitReleaseRepo, GitRemoteRepo
+from github_api import GithubRepo
 from gitlab_api import GitlabRepo
+from http_pool import http_session
 from utils import Activity, License
 
 # TODO: ist this a good approach?
@@ -60,7 +65,9 @@ class OpenSourceProject:
     # CI/Coverage
 
     @classmethod
-    def from_dict(cls, d: dict) -> "OpenSourceProject":
+    def from_dict(
+        cls, d: dict, repo_api_factory: Callable[[str], Any] = None
+    ) -> "OpenSourceProject":
         def get_dict_value(
             d: Dict[str, Any], key: str, validator: Callable[[str], bool] = None
         ) -> Optional[Any]:
@@ -81,18 +88,9 @@ class OpenSourceProject:
         repository = get_dict_value(d, "repository")
         assert isinstance(repository, str), "Project needs to have a valid url!"
 
-        repo_api: Any = None
-        parsed_repo_url = urlparse(repository)
-        if parsed_repo_url.netloc == "github.com":
-            try:
-                repo_api = GithubRepo(repository)
-            except ValueError:
-                repo_api = None
-        else:
-            try:
-                repo_api = GitlabRepo(repository)
-            except:
-                pass
+        if repo_api_factory is None:
+            repo_api_factory = open_repo_api
+        repo_api = repo_api_factory(repository)
 
         description = get_dict_value(d, "description")
         assert isinstance(
@@ -229,6 +227,37 @@ class OpenSourceProject:
             safe_fmt(self.first_release, Activity.as_str),
         ]
 
+    def to_json_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        for key in ["first_release", "last_update", "latest_release"]:
+            if d[key] is not None:
+                d[key]["date"] = d[key]["date"].isoformat()
+        return d
+
+    @classmethod
+    def from_json_dict(cls, d: Dict[str, Any]) -> "OpenSourceProject":
+        def activity_from_dict(a: Optional[Dict[str, Any]]) -> Optional[Activity]:
+            if a is None:
+                return None
+            return Activity(date.fromisoformat(a["date"]), a["url"])
+
+        license_name = None
+        if d["license_name"] is not None:
+            license_name = License(d["license_name"]["name"], d["license_name"]["url"])
+
+        return cls(
+            name=d["name"],
+            repository=d["repository"],
+            description=d["description"],
+            homepage=d["homepage"],
+            license_name=license_name,
+            languages=d["languages"],
+            tags=d["tags"],
+            last_update=activity_from_dict(d["last_update"]),
+            latest_release=activity_from_dict(d["latest_release"]),
+            first_release=activity_from_dict(d["first_release"]),
+        )
+
 
 class InvalidUrlStrategy(Enum):
     IGNORE = 1
@@ -236,9 +265,35 @@ class InvalidUrlStrategy(Enum):
     REPORT = 3
 
 
+@dataclass
+class SchemaError:
+    # None if the whole project list is affected
+    category: Optional[str]
+    # position of the project within its category, starting at 1. None if the whole category is affected
+    index: Optional[int]
+    name: Optional[str]
+    message: str
+
+    def __str__(self) -> str:
+        if self.category is None:
+            return f"Project list: {self.message}"
+        if self.index is None:
+            return f"{self.category}: {self.message}"
+        project = f"{self.category} #{self.index}"
+        if self.name is not None:
+            project += f' ("{self.name}")'
+        return f"{project}: {self.message}"
+
+
+MANDATORY_KEYS = ["name", "repository", "description"]
+OPTIONAL_KEYS = ["homepage", "license", "first_release", "languages", "tags"]
+
+
 @dataclass
 class RawOpenSourceProjectList:
     projects: List[Tuple[str, Dict[str, Any]]]
+    # problems with the structure of the yaml file, found while reading it
+    structure_errors: List[SchemaError] = field(default_factory=list)
 
     @classmethod
     def from_yaml(
@@ -247,10 +302,92 @@ class RawOpenSourceProjectList:
     ) -> "RawOpenSourceProjectList":
 
         projects = []
+        structure_errors = []
+        if not isinstance(yaml_content, dict):
+            structure_errors.append(
+                SchemaError(
+                    None, None, None, "Has to be a mapping of categories to projects"
+                )
+            )
+            return RawOpenSourceProjectList(projects, structure_errors)
+
         for category in yaml_content:
+            if not isinstance(yaml_content[category], list):
+                structure_errors.append(
+                    SchemaError(category, None, None, "Has to be a list of projects")
+                )
+                continue
             for proj in yaml_content[category]:
                 projects.append((category, proj))
-        return RawOpenSourceProjectList(projects)
+        return RawOpenSourceProjectList(projects, structure_errors)
+
+    def schema_errors(self) -> List[SchemaError]:
+        def check_project(proj: Any) -> List[str]:
+            if not isinstance(proj, dict):
+                return [f"Project has to be a mapping, not {type(proj).__name__}"]
+
+            problems = []
+            for key in proj:
+                if key not in MANDATORY_KEYS and key not in OPTIONAL_KEYS:
+                    problems.append(f"Unknown key '{key}'")
+
+            for key in MANDATORY_KEYS:
+                if not proj.get(key):
+                    problems.append(f"Missing mandatory key '{key}'")
+                elif not isinstance(proj[key], str):
+                    problems.append(f"'{key}' has to be a string")
+
+            for key in ["homepage", "license"]:
+                if proj.get(key) and not isinstance(proj[key], str):
+                    problems.append(f"'{key}' has to be a string")
+
+            for key in ["repository", "homepage"]:
+                if isinstance(proj.get(key), str) and not validators.url(proj[key]):
+                    problems.append(f"'{key}' is not a valid URL: {proj[key]}")
+
+            for key in ["languages", "tags"]:
+                val = proj.get(key)
+                if val and (
+                    not isinstance(val, list)
+                    or not all(isinstance(v, str) for v in val)
+                ):
+                    problems.append(f"'{key}' has to be a list of strings")
+
+            first_release = proj.get("first_release")
+            if first_release and not isinstance(first_release, date):
+                # e.g. a plain year is loaded as int, which can't be parsed later on
+                valid_date = isinstance(first_release, str)
+                if valid_date:
+                    try:
+                        parse(first_release)
+                    except (ValueError, OverflowError):
+                        valid_date = False
+                if not valid_date:
+                    problems.append(
+                        f"'first_release' is not a valid date: {first_release}"
+                    )
+
+            return problems
+
+        errors = list(self.structure_errors)
+        indices: Dict[str, int] = defaultdict(int)
+        for category, proj in self.projects:
+            indices[category] += 1
+            name = proj.get("name") if isinstance(proj, dict) else None
+            for problem in check_project(proj):
+                errors.append(
+                    SchemaError(category, indices[category], name, problem)
+                )
+        return errors
+
+    def schema_is_valid(self) -> bool:
+        errors = self.schema_errors()
+        if len(errors) > 0:
+            error(f"The project list contains {len(errors)} errors:")
+            for err in errors:
+                error(f"- {err}")
+            return False
+        return True
 
     def repo_urls_are_valid(self) -> bool:
         invalid_urls = generate_invalid_url_list(
@@ -300,28 +437,30 @@ class OpenSourceProjectList:
     def from_raw_list(
         cls,
         raw_project_list: RawOpenSourceProjectList,
+        repo_api_factory: Callable[[str], Any] = None,
     ) -> "OpenSourceProjectList":
 
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            proj_list = list(
-                executor.map(
-                    lambda cat_proj: (
-                        cat_proj[0],
-                        OpenSourceProject.from_dict(cat_proj[1]),
-                    ),
-                    raw_project_list.projects,
+        def parse_project(
+            cat_proj: Tuple[str, Dict[str, Any]]
+        ) -> Tuple[str, OpenSourceProject]:
+            category, proj = cat_proj
+            try:
+                return category, OpenSourceProject.from_dict(proj, repo_api_factory)
+            except REPO_API_ERRORS as exc:
+                # e.g. the host went down after the repository was opened
+                warning(
+                    f"Querying {proj['repository']} failed, only the user provided data is used: {exc}"
                 )
-            )
+                return category, OpenSourceProject.from_dict(proj, lambda repo: None)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            proj_list = list(executor.map(parse_project, raw_project_list.projects))
         projects = defaultdict(list)
         for category, proj in proj_list:
             projects[category].append(proj)
 
         info(f"Successfully parsed {len(proj_list)} projects")
 
-        info(
-            f"GitHub RateLimit: remaining after {github_api.get_rate_limit().core.remaining}"
-        )
-
         return OpenSourceProjectList(projects)
 
     def write_as_html(self, htmlfile: TextIO):
@@ -364,6 +503,14 @@ class OpenSourceProjectList:
                     csvfile.write(f"{entry.replace(';',',')};")
                 csvfile.write(f"\n")
 
+    def write_as_json(self, jsonfile: TextIO):
+        snapshot = {
+            proj.repository: proj.to_json_dict()
+            for category in self.custom_sorted_categories()
+            for proj in self.projects_sorted(category)
+        }
+        json.dump(snapshot, jsonfile, indent=1)
+
     def projects_sorted(self, category: str) -> List[OpenSourceProject]:
         def sort_projects_alphanumeric(l: List[OpenSourceProject]):
             convert = lambda text: int(text) if text.isdigit() else str.casefold(text)
@@ -381,25 +528,76 @@ class OpenSourceProjectList:
         return categories
 
 
+# Errors of the API backends that should not abort the whole run
+REPO_API_ERRORS = (requests.RequestException, GithubException, GitlabError)
+
+TAG_URLS = {
+    ForgeType.GITHUB: "{url}/releases/tag/{tag}",
+    ForgeType.GITLAB: "{url}/-/tags/{tag}",
+}
+COMMIT_URLS = {
+    ForgeType.GITHUB: "{url}/commit/{sha}",
+    ForgeType.GITLAB: "{url}/-/commit/{sha}",
+}
+
+
+def open_repo_api(repository: str, git_releases: bool = False) -> Any:
+    """Returns None if there is no way to query the repository, e.g. because it doesn't exist.
+
+    Raises one of REPO_API_ERRORS if the repository couldn't be queried right now,
+    e.g. because the host is down or its circuit breaker is open.
+    """
+    forge = forge_cache.forge_type(repository)
+    api_repo = None
+    if forge == ForgeType.GITHUB:
+        try:
+            api_repo = GithubRepo(repository)
+        except ValueError:
+            pass
+    elif forge == ForgeType.GITLAB:
+        try:
+            api_repo = GitlabRepo(repository)
+        except ValueError:
+            pass
+
+    if api_repo is not None and not git_releases:
+        return api_repo
+
+    # The git protocol works with any host and doesn't count against any API rate limit
+    try:
+        git_repo = GitRemoteRepo(
+            repository, TAG_URLS.get(forge), COMMIT_URLS.get(forge)
+        )
+    except ValueError as exc:
+        debug(f"Cannot read the git refs of {repository}: {exc}")
+        return api_repo
+    except REPO_API_ERRORS as exc:
+        if api_repo is None:
+            raise
+        warning(f"Cannot read the git refs of {repository}, using the API instead: {exc}")
+        return api_repo
+    if api_repo is None:
+        return git_repo
+    return GitReleaseRepo(api_repo, git_repo)
+
+
 def generate_invalid_url_list(
     url_list: List[str], parallel=False
 ) -> Optional[List[Tuple[str, int]]]:
     def do_request(url):
-        retry_attempt = 0
         header = {
             # Random header from Stackoverflow
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"
         }
         try:
-            resp = requests.get(url, timeout=10, headers=header)
-            while resp.status_code == 429:
-                info(f"Got rate-limited (response 429) for {url} - retrying")
-                retry_attempt += 1
-                sleep(2.0 * retry_attempt)
-                resp = requests.get(url, timeout=10, headers=header)
-        except (requests.ReadTimeout, requests.ConnectTimeout):
+            # Rate limits and transient errors are retried by the session
+            resp = http_session.get(url, timeout=10, headers=header)
+        except requests.Timeout:
             warning(f"URL {url} has timed out")
             return (url, 408)
+        except requests.RequestException as exc:
+            warning(f"URL {url} is not reachable: {exc}")
+            return (url, 503)
 
         debug(f"URL {url} has status {resp.status_code}")
         return (url, resp.status_code)
@@ -0,0 +1,259 @@
+import heapq
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from logging import debug, error, info, warning
+from time import sleep, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from oss_project import (OpenSourceProject, OpenSourceProjectList,
+                         RawOpenSourceProjectList)
+from utils import write_atomically
+
+SECONDS_PER_DAY = 24 * 60 * 60
+MIN_REFRESH_INTERVAL = 60 * 60
+MAX_REFRESH_INTERVAL = 7 * SECONDS_PER_DAY
+# How often the yaml file is checked for modifications while waiting for the next refresh
+YAML_POLL_INTERVAL = 60
+# Number of distinct `last_update` dates kept per project to estimate its change rate
+MAX_HISTORY_LENGTH = 20
+
+
+def normalized_raw_project(raw_project: Dict[str, Any]) -> Dict[str, Any]:
+    # The yaml loader creates date objects, which are stored as strings in the state file
+    return json.loads(json.dumps(raw_project, default=str))
+
+
+@dataclass
+class RefreshEntry:
+    category: str
+    raw_project: Dict[str, Any]
+    project: Optional[OpenSourceProject] = None
+    # distinct `last_update` dates seen for this project, oldest first
+    history: List[date] = field(default_factory=list)
+    next_refresh: float = 0.0
+    failures: int = 0
+
+    @property
+    def repository(self) -> str:
+        return self.raw_project["repository"]
+
+    def record_last_update(self, last_update: Optional[date]):
+        if last_update is None or last_update in self.history:
+            return
+        self.history.append(last_update)
+        self.history.sort()
+        del self.history[:-MAX_HISTORY_LENGTH]
+
+    def expected_change_interval(self, today: date) -> float:
+        # Average time between two changes (in seconds). The span up to today is included,
+        # so a project that stopped changing is treated as more and more dormant.
+        if len(self.history) == 0:
+            return float(MAX_REFRESH_INTERVAL)
+        span_days = max((today - self.history[0]).days, 1)
+        return span_days * SECONDS_PER_DAY / len(self.history)
+
+    def refresh_interval(self, today: date) -> float:
+        if self.failures > 0:
+            interval = MIN_REFRESH_INTERVAL * 2 ** self.failures
+        else:
+            # Sample twice as often as the project is expected to change
+            interval = self.expected_change_interval(today) / 2
+        return min(max(interval, MIN_REFRESH_INTERVAL), MAX_REFRESH_INTERVAL)
+
+    def to_state_dict(self) -> Dict[str, Any]:
+        return {
+            "raw_project": normalized_raw_project(self.raw_project),
+            "project": self.project.to_json_dict() if self.project is not None else None,
+            "history": [d.isoformat() for d in self.history],
+            "next_refresh": self.next_refresh,
+            "failures": self.failures,
+        }
+
+    def load_state_dict(self, d: Dict[str, Any]):
+        if d["project"] is not None:
+            self.project = OpenSourceProject.from_json_dict(d["project"])
+        self.history = [date.fromisoformat(h) for h in d["history"]]
+        self.next_refresh = d["next_refresh"]
+        self.failures = d["failures"]
+        if d.get("raw_project") != normalized_raw_project(self.raw_project):
+            # The user provided data was changed while the daemon was not running
+            self.next_refresh = 0.0
+
+
+class RefreshScheduler:
+    """Refreshes the projects one by one, the most overdue first, instead of all at once.
+
+    Every project gets a refresh interval derived from how often its `last_update`
+    changed in the past. The refreshes are spaced evenly over the day according to
+    `refreshes_per_day`, and the tables and the snapshot are rewritten whenever a
+    refresh changed a project.
+    """
+
+    def __init__(
+        self,
+        yaml_filename: str,
+        state_filename: str,
+        refreshes_per_day: int,
+        snapshot_filename: str,
+        repo_api_factory: Callable[[str], Any] = None,
+        html_filename: str = "table.html",
+        csv_filename: str = "table.csv",
+    ):
+        self.yaml_filename = yaml_filename
+        self.state_filename = state_filename
+        self.refresh_spacing = SECONDS_PER_DAY / refreshes_per_day
+        self.snapshot_filename = snapshot_filename
+        self.repo_api_factory = repo_api_factory
+        self.html_filename = html_filename
+        self.csv_filename = csv_filename
+
+        self.entries: Dict[str, RefreshEntry] = {}
+        # heap of (next_refresh, repository). Outdated items are skipped when popped.
+        self.queue: List[Tuple[float, str]] = []
+        self.yaml_mtime: Optional[float] = None
+        self.saved_state: Dict[str, Any] = {}
+
+        if os.path.exists(state_filename):
+            with open(state_filename, "r") as statefile:
+                self.saved_state = json.load(statefile)
+            info(f"Loaded refresh state of {len(self.saved_state)} projects")
+
+    def reload_projects(self) -> bool:
+        try:
+            mtime = os.path.getmtime(self.yaml_filename)
+            if mtime == self.yaml_mtime:
+                return False
+            with open(self.yaml_filename, "r") as yamlfile:
+                yaml_content = yaml.safe_load(yamlfile)
+        except OSError as exc:
+            # e.g. briefly missing during a checkout, it is read again on the next poll
+            error(f"Cannot read the yaml file, keeping the previous project list: {exc}")
+            return False
+        except yaml.YAMLError as exc:
+            self.yaml_mtime = mtime
+            error(f"Invalid yaml file, keeping the previous project list: {exc}")
+            return False
+        self.yaml_mtime = mtime
+        raw_project_list = RawOpenSourceProjectList.from_yaml(yaml_content)
+        if (
+            not raw_project_list.schema_is_valid()
+            or raw_project_list.contains_duplicates()
+        ):
+            error("Keeping the previous project list")
+            return False
+
+        entries = {}
+        changed = False
+        for category, raw_project in raw_project_list.projects:
+            repository = raw_project["repository"]
+            entry = self.entries.get(repository)
+            if entry is None:
+                entry = RefreshEntry(category, raw_project)
+                if repository in self.saved_state:
+                    entry.load_state_dict(self.saved_state[repository])
+                self.schedule(entry, entry.next_refresh)
+            elif entry.raw_project != raw_project:
+                # User provided data changed, so the project has to be refreshed right away
+                entry.raw_project = raw_project
+                self.schedule(entry, 0.0)
+            if entry.category != category:
+                entry.category = category
+                changed = True
+            entries[repository] = entry
+
+        info(f"Watching {len(entries)} projects from {self.yaml_filename}")
+        changed = changed or entries.keys() != self.entries.keys()
+        self.entries = entries
+        return changed
+
+    def schedule(self, entry: RefreshEntry, next_refresh: float):
+        entry.next_refresh = next_refresh
+        heapq.heappush(self.queue, (next_refresh, entry.repository))
+
+    def peek_next(self) -> Optional[RefreshEntry]:
+        while len(self.queue) > 0:
+            next_refresh, repository = self.queue[0]
+            entry = self.entries.get(repository)
+            if entry is not None and entry.next_refresh == next_refresh:
+                return entry
+            heapq.heappop(self.queue)
+        return None
+
+    def refresh(self, entry: RefreshEntry) -> bool:
+        try:
+            project = OpenSourceProject.from_dict(
+                entry.raw_project, self.repo_api_factory
+            )
+        except Exception as exc:
+            # e.g. the host is down, so the previous data of the project is kept until it is back
+            entry.failures += 1
+            warning(f"Refreshing {entry.repository} failed ({entry.failures}x): {exc}")
+            self.schedule(entry, time() + entry.refresh_interval(date.today()))
+            return False
+
+        entry.failures = 0
+        if project.last_update is not None:
+            entry.record_last_update(project.last_update.date)
+        self.schedule(entry, time() + entry.refresh_interval(date.today()))
+        debug(
+            f"Refreshed {entry.repository}, next refresh in {round((entry.next_refresh - time()) / 3600, 1)} hours"
+        )
+
+        changed = project != entry.project
+        entry.project = project
+        return changed
+
+    def all_projects_attempted(self) -> bool:
+        # Also False as long as no valid project list was loaded
+        return len(self.entries) > 0 and all(
+            e.project is not None or e.failures > 0 for e in self.entries.values()
+        )
+
+    def save_state(self):
+        self.saved_state.update(
+            {repo: entry.to_state_dict() for repo, entry in self.entries.items()}
+        )
+
+        def write_state(statefile):
+            json.dump(self.saved_state, statefile, indent=1)
+
+        write_atomically(self.state_filename, write_state)
+
+    def write_tables(self):
+        projects = defaultdict(list)
+        for entry in self.entries.values():
+            if entry.project is not None:
+                projects[entry.category].append(entry.project)
+        project_list = OpenSourceProjectList(projects)
+
+        write_atomically(self.html_filename, project_list.write_as_html)
+        write_atomically(self.csv_filename, project_list.write_as_csv)
+        write_atomically(self.snapshot_filename, project_list.write_as_json)
+        info(f"Updated {self.html_filename}, {self.csv_filename} and {self.snapshot_filename}")
+
+    def run(self):
+        tables_outdated = True
+        while True:
+            if self.reload_projects():
+                tables_outdated = True
+            # Don't replace a complete table with a partial one while projects are still pending
+            if tables_outdated and self.all_projects_attempted():
+                self.write_tables()
+                tables_outdated = False
+
+            entry = self.peek_next()
+            wait = YAML_POLL_INTERVAL if entry is None else entry.next_refresh - time()
+            if wait > 0:
+                sleep(min(wait, YAML_POLL_INTERVAL))
+                continue
+
+            heapq.heappop(self.queue)
+            if self.refresh(entry):
+                tables_outdated = True
+            self.save_state()
+            sleep(self.refresh_spacing)
@@ -0,0 +1,162 @@
+import math
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from logging import info, warning
+from threading import Lock
+from time import monotonic, time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+
+class HostUnavailableError(requests.ConnectionError):
+    """Raised without sending a request if the circuit breaker of the host is open"""
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    # The delay before the n-th retry is drawn from [0, base_delay * 2^n] (full jitter)
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    # Maximum time spent waiting for the retries of a single request. If a retry would exceed
+    # it (e.g. because of a long Retry-After), the last response is returned instead.
+    max_total_delay: float = 300.0
+    # Hosts whose rate limits are worth waiting for longer. Github's rate limit is reset
+    # every hour, and without waiting all following API calls fail as well.
+    host_max_total_delay: Dict[str, float] = field(
+        default_factory=lambda: {"api.github.com": 3660.0}
+    )
+    # Github asks to wait at least one minute on secondary rate limits without Retry-After
+    secondary_rate_limit_delay: float = 60.0
+    retry_statuses: tuple = (429, 502, 503, 504)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def total_delay_left(self, host: Optional[str], waited: float) -> float:
+        return self.host_max_total_delay.get(host, self.max_total_delay) - waited
+
+    def retry_delay(
+        self, attempt: int, response: requests.Response, waited: float = 0.0
+    ) -> Optional[float]:
+        """Returns how long to wait before retrying `response`, or None if it shouldn't be retried.
+
+        `waited` is the time already spent waiting for previous retries of the same request.
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is None and response.status_code in [403, 429]:
+            retry_after = rate_limit_delay(response, self.secondary_rate_limit_delay)
+        if retry_after is not None:
+            # Github signals rate limits with 403
+            if response.status_code not in self.retry_statuses + (403,):
+                return None
+            delay = retry_after
+        elif response.status_code in self.retry_statuses:
+            delay = self.backoff(attempt)
+        else:
+            return None
+
+        if delay > self.total_delay_left(urlparse(response.url).hostname, waited):
+            return None
+        return delay
+
+
+def rate_limit_delay(
+    response: requests.Response, secondary_rate_limit_delay: float
+) -> Optional[float]:
+    # See https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            reset = float(response.headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return None
+        if not math.isfinite(reset):
+            return None
+        # one additional second, as the reset time is rounded
+        return max(reset - time(), 0.0) + 1.0
+    if "secondary rate limit" in response.text.lower():
+        return secondary_rate_limit_delay
+    return None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either a number of seconds or a HTTP date
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        if not math.isfinite(seconds):
+            return None
+        return max(seconds, 0.0)
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max((retry_date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+@dataclass
+class _HostState:
+    consecutive_failures: int = 0
+    opened_at: Optional[float] = None
+
+
+class CircuitBreaker:
+    """Stops sending requests to a host after `failure_threshold` consecutive network failures.
+
+    After `reset_timeout` seconds a single request is let through again (half open).
+    If it succeeds the circuit is closed, otherwise it stays open for another period.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = Lock()
+
+    def check(self, host: str):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.opened_at is None:
+                return
+            if monotonic() - state.opened_at < self.reset_timeout:
+                raise HostUnavailableError(
+                    f"{host} is considered unavailable after {state.consecutive_failures} failed requests"
+                )
+            # half open: let this request through, further ones fail until it is finished
+            state.opened_at = monotonic()
+
+    def record_success(self, host: str):
+        with self._lock:
+            if host in self._hosts:
+                if self._hosts[host].opened_at is not None:
+                    info(f"{host} is reachable again")
+                del self._hosts[host]
+
+    def record_failure(self, host: str) -> bool:
+        """Returns True if the circuit of the host is open now"""
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            state.consecutive_failures += 1
+            if state.consecutive_failures < self.failure_threshold:
+                return False
+            if state.opened_at is None:
+                warning(f"{host} seems to be down, skipping it for {self.reset_timeout}s")
+            state.opened_at = monotonic()
+            return True
+
+
+retry_policy = RetryPolicy()
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,55 @@
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, TextIO
+
+from oss_project import OpenSourceProject
+from utils import Activity, License
+
+
+class SnapshotRepo:
+    """Provides the same interface as GithubRepo/GitlabRepo, but serves the data of a previous run"""
+
+    project: OpenSourceProject
+
+    def __init__(self, project: OpenSourceProject):
+        self.project = project
+
+    def get_latest_release(self) -> Optional[Activity]:
+        return self.project.latest_release
+
+    def get_first_release(self) -> Optional[Activity]:
+        return self.project.first_release
+
+    def get_license(self) -> Optional[License]:
+        return self.project.license_name
+
+    def get_last_activity(self) -> Optional[Activity]:
+        return self.project.last_update
+
+    def get_languages(self) -> Optional[List[str]]:
+        return self.project.languages
+
+    def get_tags(self) -> List[str]:
+        return self.project.tags or []
+
+
+@dataclass
+class ProjectSnapshot:
+    projects: Dict[str, OpenSourceProject]
+
+    @classmethod
+    def from_json(cls, jsonfile: TextIO) -> "ProjectSnapshot":
+        snapshot = json.load(jsonfile)
+        return ProjectSnapshot(
+            {
+                repository: OpenSourceProject.from_json_dict(proj)
+                for repository, proj in snapshot.items()
+            }
+        )
+
+    def open_repo_api(self, repository: str) -> Optional[SnapshotRepo]:
+        # Projects that are not in the snapshot yet only show their user provided fields
+        proj = self.projects.get(repository)
+        if proj is None:
+            return None
+        return SnapshotRepo(proj)
@@ -0,0 +1,85 @@
+import os
+import subprocess
+from datetime import date
+
+import pytest
+import requests
+
+from git_remote import GitRemoteRepo, commit_date_cache
+
+
+def git(*args, cwd=None, commit_date=None):
+    env = dict(os.environ)
+    if commit_date is not None:
+        env["GIT_AUTHOR_DATE"] = commit_date
+        env["GIT_COMMITTER_DATE"] = commit_date
+    subprocess.run(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.org", *args],
+        cwd=cwd,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def bare_repo(tmp_path):
+    work = tmp_path / "work"
+    git("init", "--quiet", str(work))
+    commits = [
+        ("2019-05-01T12:00:00+00:00", "v0.9"),
+        ("2020-02-01T12:00:00+00:00", "v1.10"),
+        ("2020-01-01T12:00:00+00:00", "v1.2"),
+        ("2021-03-01T12:00:00+00:00", None),
+    ]
+    for i, (commit_date, tag) in enumerate(commits):
+        git(
+            "commit",
+            "--quiet",
+            "--allow-empty",
+            "-m",
+            f"commit {i}",
+            cwd=work,
+            commit_date=commit_date,
+        )
+        if tag is not None:
+            git("tag", "-a", "-m", tag, tag, cwd=work, commit_date=commit_date)
+    git("tag", "not-a-release", cwd=work)
+
+    bare = tmp_path / "bare.git"
+    git("clone", "--quiet", "--bare", str(work), str(bare))
+    yield bare.as_uri()
+    commit_date_cache.dates.clear()
+
+
+def test_release_dates(bare_repo):
+    repo = GitRemoteRepo(bare_repo, "{url}/releases/tag/{tag}")
+
+    first_release = repo.get_first_release()
+    assert first_release.date == date(2019, 5, 1)
+    assert first_release.url == f"{bare_repo}/releases/tag/v0.9"
+
+    # sorted by version, not by date
+    latest_release = repo.get_latest_release()
+    assert latest_release.date == date(2020, 2, 1)
+    assert latest_release.url == f"{bare_repo}/releases/tag/v1.10"
+
+
+def test_last_activity(bare_repo):
+    repo = GitRemoteRepo(bare_repo, commit_url="{url}/-/commit/{sha}")
+
+    last_activity = repo.get_last_activity()
+    assert last_activity.date == date(2021, 3, 1)
+    assert last_activity.url == f"{bare_repo}/-/commit/{repo.head.sha}"
+    assert len(repo.head.sha) == 40
+
+
+def test_missing_repository(tmp_path):
+    with pytest.raises(ValueError):
+        GitRemoteRepo((tmp_path / "missing.git").as_uri())
+
+
+def test_unreachable_host():
+    # Distinguishable from a missing repository, so that callers can keep their previous data
+    with pytest.raises(requests.ConnectionError):
+        GitRemoteRepo("http://127.0.0.1:1/unreachable.git")
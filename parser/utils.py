@@ -1,7 +1,9 @@
+import os
 import re
+import tempfile
 from dataclasses import dataclass
 from datetime import date
-from typing import Optional
+from typing import Callable, Optional, TextIO
 
 
 def sort_tags_alphanumeric( l ):
@@ -43,3 +45,19 @@ class License:
 
     def as_str(self) -> str:
         return str(self.name)
+
+
+def write_atomically(filename: str, write: Callable[[TextIO], None]):
+    # Write into a temporary file next to the target and move it over the target afterwards,
+    # so that readers (e.g. hugo) never see a half written file
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(filename)), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as tmpfile:
+            write(tmpfile)
+        os.chmod(tmp_filename, 0o644)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
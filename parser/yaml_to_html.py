@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import argparse
+from functools import partial
 from sys import stderr
 
 import yaml
@@ -8,8 +9,15 @@ import yaml
 import logging
 from logging import info, warning, error
 
+from forge_detection import forge_cache
+from git_remote import commit_date_cache
+from github_api import github_api, print_rate_limit
+from http_pool import log_pool_statistics, set_pool_size
 from oss_project import (InvalidUrlStrategy, OpenSourceProjectList,
-                         RawOpenSourceProjectList)
+                         RawOpenSourceProjectList, open_repo_api)
+from refresh_scheduler import RefreshScheduler
+from snapshot import ProjectSnapshot
+from utils import write_atomically
 
 parser = argparse.ArgumentParser()
 parser.add_argument("yamlfilename", help="the yamlfile with the projcets")
@@ -36,7 +44,60 @@ validation_opts.add_argument(
     help="Skip the validation of the URLs. Saves time when the list is valid but a failure in the list results in a crash",
     action="store_true",
 )
+parser.add_argument(
+    "--watch",
+    help="Keep running and refresh the projects continuously, prioritized by how often they change",
+    action="store_true",
+)
+parser.add_argument(
+    "--state-file",
+    help="Where the refresh state is stored in watch mode (default: refresh_state.json)",
+    default="refresh_state.json",
+)
+parser.add_argument(
+    "--refreshes-per-day",
+    help="Number of project refreshes spread over a day in watch mode (default: 2000)",
+    type=int,
+    default=2000,
+)
+parser.add_argument(
+    "--offline",
+    help="Don't access the network, but take the automatically gathered data from the snapshot of a previous run. Implies skipping the URL validation",
+    action="store_true",
+)
+parser.add_argument(
+    "--snapshot",
+    help="Snapshot of the gathered project data. Written by online runs, read in offline mode (default: projects_snapshot.json)",
+    default="projects_snapshot.json",
+)
+parser.add_argument(
+    "--pool-size",
+    help="Maximum number of kept-alive HTTP connections per host",
+    type=int,
+)
+parser.add_argument(
+    "--forge-cache",
+    help="Where the detected forge type (Github, Gitlab, other) of each host is cached (default: forge_cache.json)",
+    default="forge_cache.json",
+)
+parser.add_argument(
+    "--git-releases",
+    help="Take releases and last activity from the git repositories instead of the Github/Gitlab API. Saves a lot of API calls",
+    action="store_true",
+)
+parser.add_argument(
+    "--commit-date-cache",
+    help="Where the dates of the commits fetched with git are cached (default: commit_date_cache.json)",
+    default="commit_date_cache.json",
+)
 args = parser.parse_args()
+if args.offline and args.watch:
+    parser.error("--offline can't be combined with --watch")
+if args.refreshes_per_day <= 0:
+    parser.error("--refreshes-per-day has to be positive")
+
+if args.pool_size is not None:
+    set_pool_size(args.pool_size)
 
 if args.verbose:
     logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -59,6 +120,19 @@ with open(args.yamlfilename, "r") as yamlfile:
 
     raw_project_list = RawOpenSourceProjectList.from_yaml(yaml_content)
 
+    # This is checked in any case, as the project list can't be processed otherwise
+    info("Checking the project list for schema errors")
+    if not raw_project_list.schema_is_valid():
+        error("Aborting due to an invalid project list")
+        exit(-1)
+
+    if not args.offline:
+        print_rate_limit()
+        forge_cache.load(args.forge_cache)
+        commit_date_cache.load(args.commit_date_cache)
+
+    repo_api_factory = partial(open_repo_api, git_releases=args.git_releases)
+
     if not args.skip_validation:
         info("Starting with validation")
         info("Checking for duplicates in project list")
@@ -68,6 +142,7 @@ with open(args.yamlfilename, "r") as yamlfile:
                 error("Aborting due to duplicate Projects", file=stderr)
                 exit(-1)
 
+    if not args.skip_validation and not args.offline:
         info("Checking for invalid URLs")
         if (
             not raw_project_list.repo_urls_are_valid()
@@ -79,16 +154,48 @@ with open(args.yamlfilename, "r") as yamlfile:
                 exit(-1)
 
     if args.validate_only:
+        log_pool_statistics()
         if valid:
             exit(0)
         else:
             exit(-1)
 
-    info("Gathering information and creating tables")
-    projects = OpenSourceProjectList.from_raw_list(raw_project_list)
+    if args.watch:
+        info("Starting continuous refresh of the project list")
+        RefreshScheduler(
+            args.yamlfilename,
+            args.state_file,
+            args.refreshes_per_day,
+            args.snapshot,
+            repo_api_factory,
+        ).run()
+
+    if args.offline:
+        info(f"Creating tables from snapshot {args.snapshot}")
+        try:
+            with open(args.snapshot, "r") as snapshotfile:
+                snapshot = ProjectSnapshot.from_json(snapshotfile)
+        except FileNotFoundError:
+            warning(f"No snapshot {args.snapshot} found, only user provided data is shown")
+            snapshot = ProjectSnapshot({})
+        projects = OpenSourceProjectList.from_raw_list(
+            raw_project_list, snapshot.open_repo_api
+        )
+    else:
+        info("Gathering information and creating tables")
+        projects = OpenSourceProjectList.from_raw_list(
+            raw_project_list, repo_api_factory
+        )
+        info(
+            f"GitHub RateLimit: remaining after {github_api.get_rate_limit().core.remaining}"
+        )
+
+        write_atomically(args.snapshot, projects.write_as_json)
 
     with open("table.html", "w") as htmlfile:
         projects.write_as_html(htmlfile)
 
     with open("table.csv", "w") as csvfile:
         projects.write_as_csv(csvfile)
+
+    log_pool_statistics()